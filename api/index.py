@@ -1,9 +1,22 @@
-from fastapi import FastAPI, Query
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Query, Request, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+from datetime import datetime, timezone
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure, PyMongoError
 import os
+import asyncio
+import time
+import io
+import csv
+import json
+import zlib
+import gzip
+import brotli
+import orjson
+import msgpack
 from dotenv import load_dotenv
 import uvicorn
 
@@ -34,6 +47,95 @@ collection = db.fellowships
 
 ROOT_DIR = Path(__file__).parent.parent
 
+COMPRESS_MIN_SIZE = 1024   # bytes; smaller bodies aren't worth the CPU
+MSGPACK_TYPES     = ("application/msgpack", "application/x-msgpack")
+
+EXPORT_BATCH_SIZE = 500
+EXPORT_CSV_FIELDS = [
+    "_id", "name", "organization", "deadline", "stipend", "eligibility",
+    "mode", "is_open", "tags", "apply_link", "trust_score", "last_updated",
+]
+
+# internal fields the dashboard never renders; kept out of list and stream payloads
+HIDDEN_FIELDS = {"features": 0, "source_urls": 0}
+
+STREAM_POLL_INTERVAL = 5    # seconds between written_at polls on standalone mongod
+STREAM_POLL_FIELD    = "written_at"  # server-side write time set by the scraper/manage_db WRITE_STAMP
+STREAM_KEEPALIVE     = 15   # seconds between SSE keep-alive comments
+STREAM_POLL_PREFIX   = "t:" # marks a polling cursor (vs. a change stream resume token)
+STREAM_STALE_TOKEN_CODES = {260, 280, 286}  # InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+
+FEATURE_INDEX_TTL = 300     # seconds before the in-memory feature index is reloaded
+STIPEND_RANK      = {"none": 0, "unknown": 1, "low": 2, "mid": 3, "high": 4}
+INDEX_FIELDS      = {
+    "name": 1, "organization": 1, "deadline": 1, "stipend": 1, "mode": 1,
+    "is_open": 1, "tags": 1, "apply_link": 1, "trust_score": 1, "features": 1,
+}
+
+_feature_index = {"loaded_at": 0.0, "records": []}
+_feature_lock  = asyncio.Lock()
+
+
+def build_filter(tag: str = None, open: bool = None, search: str = None) -> dict:
+    """Translate the shared list/export query params into a Mongo filter."""
+    query_filter = {}
+
+    if tag:
+        query_filter["tags"] = {"$in": [tag.lower()]}
+    if open is not None:
+        query_filter["is_open"] = open
+    if search:
+        query_filter["$or"] = [
+            {"name":         {"$regex": search, "$options": "i"}},
+            {"organization": {"$regex": search, "$options": "i"}},
+        ]
+    return query_filter
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _compressed_response(request: Request, body: bytes, media_type: str) -> Response:
+    """Brotli or gzip the body according to Accept-Encoding."""
+    accept  = request.headers.get("accept-encoding", "").lower()
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= COMPRESS_MIN_SIZE:
+        if "br" in accept:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accept:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _to_columns(docs: list[dict]) -> dict:
+    """Row list -> {"count": n, "columns": {field: [values...]}}; keys are sent once, not per row."""
+    fields = []
+    for doc in docs:
+        for key in doc:
+            if key not in fields:
+                fields.append(key)
+    return {
+        "count":   len(docs),
+        "columns": {f: [doc.get(f) for doc in docs] for f in fields},
+    }
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ";".join(str(v) for v in value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
 @app.get("/", include_in_schema=False)
 async def serve_frontend():
     return FileResponse(ROOT_DIR / "index.html")
@@ -41,30 +143,401 @@ async def serve_frontend():
 
 @app.get("/api/fellowships")
 async def get_fellowships(
+    request: Request,
     tag:    str  = Query(None, description="Filter by tag e.g. open-source, research"),
     open:   bool = Query(None, description="Filter by is_open status"),
     search: str  = Query(None, description="Search by name or org"), 
     mode:   str  = Query(None, description="Search by mode e.g. open-now, remote"),
     limit:  int  = Query(100, le=200),
+    format: str  = Query("rows", description="rows (array of objects) or columnar"),
 ):
-    query_filter = {}
+    """
+    Rows by default. format=columnar sends each key once with a value list,
+    and Accept: application/msgpack switches the encoding to MessagePack.
+    """
+    if format not in ("rows", "columnar"):
+        raise HTTPException(status_code=400, detail="format must be rows or columnar")
 
-    if tag:
-        query_filter["tags"] = {"$in": [tag.lower()]}
-    if open is not None:
-        query_filter["is_open"] = open
-    if search:
-        query_filter["$or"] = [
-            {"name":         {"$regex": search, "$options": "i"}},
-            {"organization": {"$regex": search, "$options": "i"}},
-        ]
+    pipeline = [
+        {"$match": build_filter(tag, open, search)},
+        {"$sort": {"name": 1}},
+        {"$limit": limit},
+        {"$project": HIDDEN_FIELDS},
+        # stringify _id server-side instead of looping over results in Python
+        {"$addFields": {"_id": {"$toString": "$_id"}}},
+    ]
+    results = await collection.aggregate(pipeline).to_list(length=limit)
+    payload = _to_columns(results) if format == "columnar" else results
+
+    accept = request.headers.get("accept", "").lower()
+    if any(t in accept for t in MSGPACK_TYPES):
+        body = msgpack.packb(payload, default=_json_default, use_bin_type=True)
+        return _compressed_response(request, body, "application/msgpack")
+
+    body = orjson.dumps(payload, default=_json_default)
+    return _compressed_response(request, body, "application/json")
+
+
+@app.get("/api/fellowships/export")
+async def export_fellowships(
+    request: Request,
+    format: str = Query("ndjson", description="ndjson or csv"),
+    tag:    str  = Query(None, description="Filter by tag e.g. open-source, research"),
+    open:   bool = Query(None, description="Filter by is_open status"),
+    search: str  = Query(None, description="Search by name or org"),
+    fields: str  = Query(None, description="Comma-separated fields to include e.g. name,deadline"),
+):
+    """
+    Stream every matching record straight from a batched cursor.
+    Memory stays flat regardless of collection size; output is gzipped
+    on the fly when the client sends Accept-Encoding: gzip.
+    """
+    format = format.lower()
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+
+    projection = None
+    columns    = EXPORT_CSV_FIELDS
+    if fields:
+        columns    = [f.strip() for f in fields.split(",") if f.strip()]
+        projection = {f: 1 for f in columns}
+        if "_id" not in projection:
+            projection["_id"] = 0
+
+    cursor = (
+        collection.find(build_filter(tag, open, search), projection)
+        .sort("_id", 1)
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+
+    def encode_rows(docs: list[dict]) -> bytes:
+        if format == "ndjson":
+            return b"".join(
+                orjson.dumps(doc, default=_json_default, option=orjson.OPT_APPEND_NEWLINE)
+                for doc in docs
+            )
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for doc in docs:
+            writer.writerow([_csv_value(doc.get(c)) for c in columns])
+        return buf.getvalue().encode("utf-8")
+
+    async def generate_rows():
+        if format == "csv":
+            buf = io.StringIO()
+            csv.writer(buf).writerow(columns)
+            yield buf.getvalue().encode("utf-8")
+
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield encode_rows(batch)
+                batch = []
+        if batch:
+            yield encode_rows(batch)
+
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+
+    async def generate_gzip():
+        # wbits=31 -> gzip container, so clients can decode with a stock gunzip
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        async for chunk in generate_rows():
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    headers = {"Content-Disposition": f'attachment; filename="fellowships.{format}"'}
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return StreamingResponse(
+        generate_gzip() if use_gzip else generate_rows(),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+def _sse_event(event: str, data: dict, event_id: str = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, default=_json_default, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def _is_hidden(path: str) -> bool:
+    return path.split(".", 1)[0] in HIDDEN_FIELDS
+
+
+def _change_to_diff(change: dict) -> dict:
+    """Shrink a change stream event down to what the dashboard needs to patch its row."""
+    op     = change["operationType"]
+    doc_id = str(change["documentKey"]["_id"])
+
+    if op == "update":
+        desc = change.get("updateDescription", {})
+        return {
+            "op":    "update",
+            "_id":   doc_id,
+            "set":   {k: v for k, v in desc.get("updatedFields", {}).items() if not _is_hidden(k)},
+            "unset": [k for k in desc.get("removedFields", []) if not _is_hidden(k)],
+        }
+    # insert / replace carry the whole document
+    doc = {k: v for k, v in (change.get("fullDocument") or {}).items() if not _is_hidden(k)}
+    return {"op": op, "_id": doc_id, "doc": doc}
+
+
+async def _watch_changes(resume_token: str = None):
+    """Yield (event_id, diff) pairs from a Mongo change stream."""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    kwargs = {}
+    if resume_token:
+        kwargs["resume_after"] = {"_data": resume_token}
+
+    async with collection.watch(pipeline, max_await_time_ms=1000, **kwargs) as stream:
+        while stream.alive:
+            change = await stream.try_next()
+            if change is None:
+                # idle: still report the current position so a reset event can carry it
+                yield (stream.resume_token or {}).get("_data"), None
+                continue
+            yield change["_id"]["_data"], _change_to_diff(change)
+
+
+async def _poll_changes(since: datetime = None):
+    """
+    Fallback for standalone mongod (no change streams): poll on written_at.
+    last_updated can be backdated by imports and merges, so it would miss writes.
+    Polling can't see which fields changed, so every hit is sent as a full upsert.
+    """
+    since = since or datetime.now(timezone.utc)
+    while True:
+        query  = {STREAM_POLL_FIELD: {"$gt": since}}
+        cursor = collection.find(query, HIDDEN_FIELDS).sort(STREAM_POLL_FIELD, 1)
+        found = False
+        async for doc in cursor:
+            found = True
+            since = doc[STREAM_POLL_FIELD]
+            doc["_id"] = str(doc["_id"])
+            yield STREAM_POLL_PREFIX + since.isoformat(), {"op": "upsert", "_id": doc["_id"], "doc": doc}
+        if not found:
+            yield None, None
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+
+@app.get("/api/stream")
+async def stream_updates(
+    request: Request,
+    resume: str = Query(None, description="Resume token (browsers send Last-Event-ID automatically)"),
+):
+    """
+    Server-Sent Events feed of inserts and updates on fellowships.
+    Each event's id is a resume token, so reconnecting clients pick up
+    exactly where they left off instead of re-downloading the list. When a
+    token can't be honored the stream restarts from now and sends a
+    `reset` event first, telling the client to reload the list.
+    """
+    token = request.headers.get("last-event-id") or resume
+
+    async def event_source():
+        yield "retry: 3000\n\n"
+
+        changes, reset = None, False
+        if not (token and token.startswith(STREAM_POLL_PREFIX)):
+            resume_after = token
+            while changes is None:
+                try:
+                    changes = _watch_changes(resume_after)
+                    first = await changes.__anext__()
+                except OperationFailure as e:
+                    changes = None
+                    if resume_after and e.code in STREAM_STALE_TOKEN_CODES:
+                        # token fell off the oplog or is malformed: start from "now"
+                        resume_after, reset = None, True
+                        continue
+                    print(f"API: change stream unavailable ({e.code}), polling {STREAM_POLL_FIELD}")
+                    reset = bool(token)
+                    break
+
+        if changes is None:
+            since = None
+            if token and token.startswith(STREAM_POLL_PREFIX):
+                try:
+                    since = datetime.fromisoformat(token[len(STREAM_POLL_PREFIX):])
+                except ValueError:
+                    reset = True
+            since = since or datetime.now(timezone.utc)
+            changes = _poll_changes(since)
+            first = await changes.__anext__()
+            if first[0] is None:
+                first = (STREAM_POLL_PREFIX + since.isoformat(), None)
+
+        if reset:
+            # the client missed changes we can no longer replay
+            yield _sse_event("reset", {}, first[0])
+
+        last_sent = asyncio.get_running_loop().time()
+        pending   = [first]
+        try:
+            while not await request.is_disconnected():
+                event_id, diff = pending.pop() if pending else await changes.__anext__()
+                now = asyncio.get_running_loop().time()
+                if diff is not None:
+                    yield _sse_event("change", diff, event_id)
+                    last_sent = now
+                elif now - last_sent >= STREAM_KEEPALIVE:
+                    yield ": keep-alive\n\n"
+                    last_sent = now
+        except (StopAsyncIteration, PyMongoError) as e:
+            print(f"API: stream closed ({e.__class__.__name__})")
+        finally:
+            await changes.aclose()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _fallback_features(doc: dict) -> dict:
+    """Rough features for records scraped before features were precomputed."""
+    deadline = doc.get("deadline")
+    try:
+        deadline = datetime.strptime(str(deadline), "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        deadline = None
+    return {
+        "degrees":      [],
+        "locations":    [],
+        "remote":       "remote" in (doc.get("mode") or "").lower(),
+        "domains":      [t.lower() for t in doc.get("tags") or []],
+        "stipend_band": "unknown",
+        "deadline":     deadline,
+    }
+
+
+async def _get_feature_index() -> list[dict]:
+    """All records with just the fields needed for ranking, cached for FEATURE_INDEX_TTL."""
+    if time.monotonic() - _feature_index["loaded_at"] < FEATURE_INDEX_TTL:
+        return _feature_index["records"]
+
+    async with _feature_lock:
+        if time.monotonic() - _feature_index["loaded_at"] < FEATURE_INDEX_TTL:
+            return _feature_index["records"]
+        records = []
+        async for doc in collection.find({}, INDEX_FIELDS).batch_size(1000):
+            doc["_id"] = str(doc["_id"])
+            features = doc.pop("features", None) or _fallback_features(doc)
+            doc["_f"] = {
+                "degrees":      set(features.get("degrees") or []),
+                "locations":    features.get("locations") or [],
+                "remote":       bool(features.get("remote")),
+                "domains":      set(features.get("domains") or []),
+                "stipend_rank": STIPEND_RANK.get(features.get("stipend_band"), 1),
+                "deadline":     features.get("deadline"),
+            }
+            records.append(doc)
+        _feature_index["records"]   = records
+        _feature_index["loaded_at"] = time.monotonic()
+        print(f"API: feature index loaded ({len(records)} records)")
+        return records
+
+
+def _score_record(f: dict, profile: dict, today: str) -> tuple[float, list[str]] | None:
+    """Score one record's features against a profile; None means ineligible."""
+    score, reasons = 0.0, []
+
+    if f["deadline"] and f["deadline"] < today and not profile["include_closed"]:
+        return None
+
+    if profile["degree"]:
+        if f["degrees"] and profile["degree"] not in f["degrees"]:
+            return None
+        if profile["degree"] in f["degrees"]:
+            score += 2
+            reasons.append("degree")
+
+    if f["remote"]:
+        score += 2
+        reasons.append("remote")
+    elif profile["remote_only"]:
+        return None
+    elif f["locations"] and profile["locations"]:
+        if any(p in loc or loc in p for p in profile["locations"] for loc in f["locations"]):
+            score += 3
+            reasons.append("location")
+        else:
+            score -= 2
+
+    overlap = f["domains"] & profile["domains"]
+    if overlap:
+        score += 2 * len(overlap)
+        reasons.extend(sorted(overlap))
+
+    if f["stipend_rank"] < profile["min_stipend"]:
+        return None
+    score += 0.5 * f["stipend_rank"]
+
+    if f["deadline"] and f["deadline"] >= today:
+        days_left = (datetime.fromisoformat(f["deadline"]).date() - datetime.fromisoformat(today).date()).days
+        if days_left <= 30:
+            score += 1
+            reasons.append("closing-soon")
+
+    return score, reasons
+
+
+@app.get("/api/recommendations")
+async def get_recommendations(
+    location:    str  = Query(None, description="e.g. Bangalore, Karnataka, India"),
+    degree:      str  = Query(None, description="ug, pg or phd"),
+    domains:     str  = Query(None, description="Comma-separated e.g. ai-ml,open-source,research"),
+    remote_only: bool = Query(False, description="Only remote opportunities"),
+    min_stipend: str  = Query(None, description="none, low, mid or high"),
+    include_closed: bool = Query(False, description="Include past deadlines"),
+    limit:       int  = Query(20, le=100),
+):
+    """
+    Rank opportunities for an arbitrary student profile using the eligibility
+    features the scraper precomputed. Pure in-memory scoring, no LLM calls.
+    """
+    if degree and degree.lower() not in ("ug", "pg", "phd"):
+        raise HTTPException(status_code=400, detail="degree must be ug, pg or phd")
+    if min_stipend and min_stipend.lower() not in STIPEND_RANK:
+        raise HTTPException(status_code=400, detail="min_stipend must be none, low, mid or high")
+
+    profile = {
+        "degree":         degree.lower() if degree else None,
+        "locations":      [p.strip().lower() for p in (location or "").split(",") if p.strip()],
+        "domains":        {d.strip().lower() for d in (domains or "").split(",") if d.strip()},
+        "remote_only":    remote_only,
+        "min_stipend":    STIPEND_RANK.get((min_stipend or "none").lower(), 0),
+        "include_closed": include_closed,
+    }
+    today = datetime.now(timezone.utc).date().isoformat()
+
+    ranked = []
+    for doc in await _get_feature_index():
+        scored = _score_record(doc["_f"], profile, today)
+        if scored is None:
+            continue
+        score, reasons = scored
+        score += (doc.get("trust_score") or 0) / 100
+        if doc.get("is_open"):
+            score += 1
+        ranked.append((score, reasons, doc))
 
-    cursor = collection.find(query_filter).sort("name", 1).limit(limit)
-    results = []
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        results.append(doc)
-    return results
+    ranked.sort(key=lambda r: r[0], reverse=True)
+    return [
+        {**{k: v for k, v in doc.items() if k != "_f"}, "score": round(score, 2), "reasons": reasons}
+        for score, reasons, doc in ranked[:limit]
+    ]
 
 
 @app.get("/api/tags")
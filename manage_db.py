@@ -1,10 +1,20 @@
 import asyncio
+import argparse
+import csv
+import json
 import os
-from datetime import datetime
+import sys
+from datetime import datetime, timezone
 from pathlib import Path
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, DeleteMany
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
+from scraper.utils.features import FEATURE_SOURCE_FIELDS, refresh_features
+from scraper.utils.resolve import EntityResolver, merge_documents
+from scraper.utils.links import normalize_url
+from scraper.utils.bloom import WRITE_STAMP
 
 # Load Env
 env_path = Path(__file__).parent / '.env'
@@ -15,6 +25,118 @@ else:
 
 MONGO_URL = os.getenv("MONGO_URL")
 
+BATCH_SIZE = 500
+
+# Fields written by scraper/main.py — imports are normalized to exactly these
+SCHEMA_FIELDS = [
+    "name", "organization", "deadline", "stipend", "eligibility", "mode",
+    "is_open", "tags", "apply_link", "trust_score", "last_updated",
+]
+
+# Legacy manual categories -> scraper-style tags
+CATEGORY_TAGS = {
+    "open source": "open-source",
+    "research": "research",
+    "corporate internship": "internship",
+    "government fellowship": "fellowship",
+    "scholarship": "scholarship",
+}
+
+# Input columns that fill each stored field; a field counts as given when any is non-empty
+FIELD_SOURCES = {
+    "organization": ("organization", "org"),
+    "tags":         ("tags", "category"),
+}
+# list fields an import adds to instead of replacing
+MERGED_LISTS = ("tags", "source_urls")
+
+# Fields only the old manual-entry form wrote
+LEGACY_UNSET = {"org": "", "category": "", "location": ""}
+
+
+def _parse_bool(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value).strip().lower() in ("true", "1", "yes", "open")
+
+
+def _parse_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        dt = value
+    elif value:
+        dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    else:
+        return datetime.now(timezone.utc)
+    # naive values are assumed to already be UTC, like Mongo returns them
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def _date_arg(value: str) -> datetime:
+    """argparse type for --before/--after, so a bad date is a usage error, not a traceback."""
+    try:
+        return _parse_datetime(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an ISO date like 2025-01-31, got {value!r}")
+
+
+def _parse_tags(value) -> list[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace(",", ";").split(";")
+    return [t.strip().lower().replace(" ", "-") for t in value if str(t).strip()]
+
+
+def normalize_record(raw: dict) -> dict:
+    """
+    Validate a record and map it onto the scraper's schema
+    (org -> organization, category -> tags, UTC last_updated, features).
+    Raises ValueError if it can't be stored.
+    """
+    name = (raw.get("name") or "").strip()
+    link = (raw.get("apply_link") or "").strip()
+    if not name:
+        raise ValueError("missing name")
+    if not link.startswith(("http://", "https://")):
+        raise ValueError(f"invalid apply_link {link!r}")
+
+    tags = _parse_tags(raw.get("tags"))
+    category = (raw.get("category") or "").strip().lower()
+    if category and CATEGORY_TAGS.get(category, category) not in tags:
+        tags.append(CATEGORY_TAGS.get(category, category.replace(" ", "-")))
+
+    trust_score = raw.get("trust_score")
+    doc = {
+        "name":         name,
+        "organization": raw.get("organization") or raw.get("org") or None,
+        "deadline":     raw.get("deadline") or "Check Website",
+        "stipend":      raw.get("stipend") or None,
+        "eligibility":  raw.get("eligibility") or None,
+        "mode":         raw.get("mode") or None,
+        "is_open":      _parse_bool(raw.get("is_open")),
+        "tags":         tags,
+        "apply_link":   normalize_url(link, keep_query=True),
+        "trust_score":  int(trust_score) if trust_score not in (None, "") else 100,
+        "last_updated": _parse_datetime(raw.get("last_updated")),
+    }
+    # keeps LLM-extracted degree/location lists from a previous features block
+    doc["features"] = refresh_features({
+        **doc,
+        "features":      raw.get("features"),
+        "degree_levels": raw.get("degree_levels"),
+        "locations":     raw.get("locations"),
+    })
+    if raw.get("is_manual") is not None:
+        doc["is_manual"] = _parse_bool(raw.get("is_manual"))
+
+    # merged records remember every page they were built from
+    sources = raw.get("source_urls")
+    if isinstance(sources, str):
+        sources = sources.split(";")
+    if sources:
+        doc["source_urls"] = list(dict.fromkeys(normalize_url(u, keep_query=True) for u in sources if u and u.strip()))
+    return doc
+
 async def get_db():
     if not MONGO_URL:
         print("❌ Error: MONGO_URL not found in .env")
@@ -24,21 +146,21 @@ async def get_db():
 
 async def list_opportunities(collection):
     print("\n📋 Latest 20 Opportunities:")
-    print(f"{'ID':<25} | {'Name':<30} | {'Category':<15} | {'Deadline'}")
+    print(f"{'ID':<25} | {'Name':<30} | {'Tags':<15} | {'Deadline'}")
     print("-" * 90)
     
     cursor = collection.find().sort("last_updated", -1).limit(20)
     async for doc in cursor:
         name = (doc.get('name') or "Unknown")[:28]
-        cat = (doc.get('category') or "Other")[:15]
-        print(f"{str(doc['_id']):<25} | {name:<30} | {cat:<15} | {doc.get('deadline')}")
+        tags = ",".join(doc.get('tags') or []) or doc.get('category') or "Other"
+        print(f"{str(doc['_id']):<25} | {name:<30} | {tags[:15]:<15} | {doc.get('deadline')}")
     print("-" * 90)
 
 async def add_opportunity(collection):
     print("\n➕ Add New Opportunity")
     name = input("Name: ").strip()
     org = input("Organization: ").strip()
-    location = input("Location (default: India): ").strip() or "India"
+    mode = input("Mode (Remote / In-Person / Hybrid): ").strip()
     
     print("Categories: [1] Open Source, [2] Research, [3] Internship, [4] Fellowship, [5] Scholarship")
     cat_map = {"1": "Open Source", "2": "Research", "3": "Corporate Internship", "4": "Government Fellowship", "5": "Scholarship"}
@@ -48,18 +170,21 @@ async def add_opportunity(collection):
     deadline = input("Deadline (YYYY-MM-DD or 'Check Website'): ").strip()
     link = input("Apply Link: ").strip()
     
-    doc = {
-        "name": name,
-        "org": org,
-        "location": location,
-        "category": category,
-        "deadline": deadline,
-        "apply_link": link,
-        "last_updated": datetime.now(),
-        "is_manual": True
-    }
+    try:
+        doc = normalize_record({
+            "name": name,
+            "organization": org,
+            "mode": mode,
+            "category": category,
+            "deadline": deadline,
+            "apply_link": link,
+            "is_manual": True,
+        })
+    except ValueError as e:
+        print(f"❌ Invalid record: {e}")
+        return
     
-    await collection.insert_one(doc)
+    await collection.update_one({"apply_link": doc["apply_link"]}, {"$set": doc, **WRITE_STAMP}, upsert=True)
     print("✅ Opportunity Added Successfully!")
 
 async def delete_opportunity(collection):
@@ -73,11 +198,375 @@ async def delete_opportunity(collection):
     except Exception as e:
         print(f"❌ Error: {e}")
 
-async def main():
-    collection = await get_db()
-    if collection is None:
+# ─────────────────────────── BULK COMMANDS ───────────────────────
+
+def build_filter(args) -> dict:
+    """Mongo filter from the shared --tag/--open/--search/... flags."""
+    query = {}
+    if args.tag:
+        query["tags"] = {"$in": [t.lower() for t in args.tag]}
+    if args.open is not None:
+        query["is_open"] = args.open
+    if args.search:
+        query["$or"] = [
+            {"name":         {"$regex": args.search, "$options": "i"}},
+            {"organization": {"$regex": args.search, "$options": "i"}},
+        ]
+    if args.org:
+        query["organization"] = {"$regex": args.org, "$options": "i"}
+    if args.before or args.after:
+        query["last_updated"] = {}
+        if args.before:
+            query["last_updated"]["$lt"] = _parse_datetime(args.before)
+        if args.after:
+            query["last_updated"]["$gte"] = _parse_datetime(args.after)
+    if args.manual:
+        query["is_manual"] = True
+    return query
+
+
+def _detect_format(path: str, fmt: str) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _read_records(path: str, fmt: str):
+    """
+    Yield records one at a time so large files are never fully loaded:
+    dicts for CSV, raw lines for JSONL (parsed by the caller, so one bad
+    line is counted as invalid instead of aborting the import).
+    """
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _given_fields(raw: dict) -> set:
+    return {
+        field for field in SCHEMA_FIELDS + ["is_manual", "source_urls"]
+        if any(raw.get(col) not in (None, "", []) for col in FIELD_SOURCES.get(field, (field,)))
+    }
+
+
+def _import_update(raw: dict, doc: dict) -> dict:
+    """
+    Upsert for one imported record: $set only the columns the input
+    actually has, defaults only on insert, so a partial curation file
+    never blanks fields the scraper filled in. features is rebuilt after
+    the write, from the merged record.
+    """
+    given = _given_fields(raw)
+    update = {"$set": {}, "$setOnInsert": {}, "$addToSet": {}}
+    for field, value in doc.items():
+        if field in ("apply_link", "features"):
+            continue
+        if field in MERGED_LISTS and field in given:
+            update["$addToSet"][field] = {"$each": value}
+        elif field in given:
+            update["$set"][field] = value
+        else:
+            update["$setOnInsert"][field] = value
+    return {**{op: v for op, v in update.items() if v}, **WRITE_STAMP}
+
+
+async def import_records(collection, args):
+    fmt = _detect_format(args.file, args.format)
+    ops, stats = [], {"upserted": 0, "modified": 0, "invalid": 0}
+    feature_hints = {}   # apply_link -> degree/location lists given in the input
+
+    async def flush():
+        if not ops:
+            return
+        if not args.dry_run:
+            try:
+                result = await collection.bulk_write(ops, ordered=False)
+                stats["upserted"] += result.upserted_count
+                stats["modified"] += result.modified_count
+            except BulkWriteError as e:
+                details = e.details
+                stats["upserted"] += details.get("nUpserted", 0)
+                stats["modified"] += details.get("nModified", 0)
+                stats["invalid"]  += len(details.get("writeErrors", []))
+                for err in details.get("writeErrors", []):
+                    print(f"⚠️  Write failed: {err.get('errmsg', '')[:200]}")
+            await _refresh_features(collection, {"apply_link": {"$in": list(feature_hints)}}, feature_hints)
+        ops.clear()
+        feature_hints.clear()
+
+    for lineno, raw in enumerate(_read_records(args.file, fmt), start=1):
+        try:
+            if isinstance(raw, str):
+                raw = json.loads(raw)
+            if not isinstance(raw, dict):
+                raise ValueError("not a JSON object")
+            doc = normalize_record(raw)
+        except (ValueError, TypeError) as e:
+            stats["invalid"] += 1
+            print(f"⚠️  Record {lineno} skipped: {e}")
+            continue
+        ops.append(UpdateOne({"apply_link": doc["apply_link"]}, _import_update(raw, doc), upsert=True))
+        feature_hints[doc["apply_link"]] = {"degree_levels": raw.get("degree_levels"), "locations": raw.get("locations")}
+        if len(ops) >= args.batch_size:
+            await flush()
+    await flush()
+
+    print(f"✅ Import done: {stats['upserted']} inserted, {stats['modified']} updated, "
+          f"{stats['invalid']} invalid{' (dry run)' if args.dry_run else ''}.")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc).isoformat() if value.tzinfo is None else value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+async def export_records(collection, args):
+    fmt = _detect_format(args.file, args.format)
+    out = sys.stdout if args.file == "-" else open(args.file, "w", newline="", encoding="utf-8")
+    cursor = collection.find(build_filter(args)).sort("_id", 1).batch_size(args.batch_size)
+    count = 0
+    try:
+        if fmt == "csv":
+            fields = ["_id"] + SCHEMA_FIELDS + ["source_urls"]
+            writer = csv.writer(out)
+            writer.writerow(fields)
+            async for doc in cursor:
+                row = []
+                for f in fields:
+                    v = doc.get(f)
+                    if isinstance(v, list):
+                        v = ";".join(str(x) for x in v)
+                    elif isinstance(v, (datetime, ObjectId)):
+                        v = _json_default(v)
+                    row.append("" if v is None else v)
+                writer.writerow(row)
+                count += 1
+        else:
+            async for doc in cursor:
+                out.write(json.dumps(doc, default=_json_default, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ Exported {count} records.", file=sys.stderr)
+
+
+def _parse_assignment(expr: str) -> tuple[str, object]:
+    """field=value; value is read as JSON when possible (true, 42, ["a"]) else as a string."""
+    if "=" not in expr:
+        raise argparse.ArgumentTypeError(f"expected field=value, got {expr!r}")
+    field, value = expr.split("=", 1)
+    try:
+        value = json.loads(value)
+    except json.JSONDecodeError:
+        pass
+    return field.strip(), value
+
+
+async def _refresh_features(collection, query: dict, hints: dict = None):
+    """Recompute features for the records matching query from their stored fields."""
+    hints = hints or {}
+    ops = []
+    async for doc in collection.find(query):
+        features = refresh_features({**doc, **hints.get(doc.get("apply_link"), {})})
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"features": features}}))
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+
+
+async def update_records(collection, args):
+    update = {"$set": {"last_updated": datetime.now(timezone.utc)}, **WRITE_STAMP}
+    for field, value in args.set or []:
+        if field == "features" or field.startswith("features."):
+            print("❌ features is derived; --set the fields it is built from instead.")
+            return
+        if field in WRITE_STAMP["$currentDate"]:
+            print(f"❌ {field} is set by the server on every write.")
+            return
+        if field == "tags":
+            value = _parse_tags(value)
+        update["$set"][field] = value
+    if args.add_tag:
+        update["$addToSet"] = {"tags": {"$each": _parse_tags(args.add_tag)}}
+    if args.remove_tag:
+        update["$pullAll"] = {"tags": _parse_tags(args.remove_tag)}
+    if not (args.set or args.add_tag or args.remove_tag):
+        print("❌ Nothing to update: pass --set, --add-tag or --remove-tag.")
+        return
+    # MongoDB rejects two operators on the same path in one update
+    sets_tags = any(f == "tags" or f.startswith("tags.") for f, _ in args.set or [])
+    if sum(map(bool, (args.add_tag, args.remove_tag, sets_tags))) > 1:
+        print("❌ Use only one of --add-tag, --remove-tag and --set tags=... per run.")
         return
 
+    query = build_filter(args)
+    if args.dry_run:
+        count = await collection.count_documents(query)
+        print(f"Would update {count} records with {update}")
+        return
+
+    # collect ids first: the update may change the fields the filter matched on
+    ids = [doc["_id"] async for doc in collection.find(query, {"_id": 1}).batch_size(args.batch_size)]
+    stale = bool(args.add_tag or args.remove_tag) or any(f in FEATURE_SOURCE_FIELDS for f, _ in args.set or [])
+    modified = 0
+    for i in range(0, len(ids), args.batch_size):
+        batch = {"_id": {"$in": ids[i:i + args.batch_size]}}
+        modified += (await collection.update_many(batch, update)).modified_count
+        if stale:
+            await _refresh_features(collection, batch)
+    print(f"✅ Updated {modified} of {len(ids)} matching records.")
+
+
+async def delete_records(collection, args):
+    query = build_filter(args)
+    if not query and not args.all:
+        print("❌ Refusing to delete without a filter. Pass --all to delete everything.")
+        return
+    count = await collection.count_documents(query)
+    if not args.yes:
+        print(f"Would delete {count} records. Re-run with --yes to confirm.")
+        return
+    result = await collection.delete_many(query)
+    print(f"✅ Deleted {result.deleted_count} records.")
+
+
+async def normalize_records(collection, args):
+    """Rewrite existing records (e.g. legacy org/category entries) into the scraper schema."""
+    ops, fixed, invalid = [], 0, 0
+    claimed = set()   # apply_links this run has already moved a record onto
+
+    async def flush():
+        nonlocal fixed, invalid
+        if ops and not args.dry_run:
+            try:
+                fixed += (await collection.bulk_write(ops, ordered=False)).modified_count
+            except BulkWriteError as e:
+                fixed   += e.details.get("nModified", 0)
+                invalid += len(e.details.get("writeErrors", []))
+                for err in e.details.get("writeErrors", []):
+                    print(f"⚠️  Write failed: {err.get('errmsg', '')[:200]}")
+        ops.clear()
+
+    async for doc in collection.find(build_filter(args)).batch_size(args.batch_size):
+        try:
+            clean = normalize_record(doc)
+        except ValueError as e:
+            invalid += 1
+            print(f"⚠️  {doc['_id']} skipped: {e}")
+            continue
+
+        link = clean["apply_link"]
+        if link != doc.get("apply_link"):
+            clash = link in claimed or await collection.find_one(
+                {"apply_link": link, "_id": {"$ne": doc["_id"]}}, {"_id": 1})
+            if clash:
+                invalid += 1
+                print(f"⚠️  {doc['_id']} skipped: apply_link would collide with {link} (try dedupe)")
+                continue
+            claimed.add(link)
+
+        # $set rather than replace, so fields the scraper adds later are kept
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": clean, "$unset": LEGACY_UNSET, **WRITE_STAMP}))
+        if len(ops) >= args.batch_size:
+            await flush()
+    await flush()
+    print(f"✅ Normalized {fixed} records, {invalid} invalid{' (dry run)' if args.dry_run else ''}.")
+
+
+async def dedupe_records(collection, args):
+    """Merge records that resolve to the same program into one canonical document."""
+    resolver, clusters = EntityResolver(), {}
+    async for doc in collection.find(build_filter(args)).sort("_id", 1).batch_size(args.batch_size):
+        match_id = resolver.match(doc)
+        if match_id is None:
+            match_id = doc["_id"]
+            clusters[match_id] = []
+        clusters[match_id].append(doc)
+        resolver.add(match_id, doc)
+
+    ops, merged_away = [], 0
+    for docs in clusters.values():
+        if len(docs) < 2:
+            continue
+        merged = merge_documents(docs)
+        extra  = [d["_id"] for d in docs if d["_id"] != merged["_id"]]
+        merged_away += len(extra)
+        print(f"🔗 {merged['name']}: merging {len(docs)} records ({len(merged['source_urls'])} source URLs)")
+        fields = {k: v for k, v in merged.items() if k != "_id"}
+        # stamped so the scraper's seen-filter picks up the merged source_urls
+        ops.append(UpdateOne({"_id": merged["_id"]}, {"$set": fields, **WRITE_STAMP}))
+        ops.append(DeleteMany({"_id": {"$in": extra}}))
+
+    if ops and not args.dry_run:
+        for i in range(0, len(ops), args.batch_size):
+            await collection.bulk_write(ops[i:i + args.batch_size], ordered=True)
+    print(f"✅ Merged away {merged_away} duplicate records{' (dry run)' if args.dry_run else ''}.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Fellowship Tracker DB manager. Run without a command for the interactive menu.")
+    sub = parser.add_subparsers(dest="command")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--tag", action="append", help="Match records with this tag (repeatable)")
+    filters.add_argument("--open", dest="open", action="store_true", default=None, help="Only open records")
+    filters.add_argument("--closed", dest="open", action="store_false", help="Only closed records")
+    filters.add_argument("--search", help="Regex over name or organization")
+    filters.add_argument("--org", help="Regex over organization")
+    filters.add_argument("--before", type=_date_arg, help="last_updated before this ISO date")
+    filters.add_argument("--after", type=_date_arg, help="last_updated on/after this ISO date")
+    filters.add_argument("--manual", action="store_true", help="Only manually added records")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    common.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+
+    p = sub.add_parser("import", parents=[common], help="Upsert records from JSONL/CSV (keyed by apply_link)")
+    p.add_argument("file", help="Path, or - for stdin")
+    p.add_argument("--format", choices=["jsonl", "csv"], help="Defaults to the file extension")
+
+    p = sub.add_parser("export", parents=[filters, common], help="Stream records to JSONL/CSV")
+    p.add_argument("file", help="Path, or - for stdout")
+    p.add_argument("--format", choices=["jsonl", "csv"], help="Defaults to the file extension")
+
+    p = sub.add_parser("update", parents=[filters, common], help="Bulk update matching records")
+    p.add_argument("--set", action="append", type=_parse_assignment, metavar="FIELD=VALUE")
+    p.add_argument("--add-tag", action="append")
+    p.add_argument("--remove-tag", action="append")
+
+    p = sub.add_parser("delete", parents=[filters, common], help="Bulk delete matching records")
+    p.add_argument("--yes", action="store_true", help="Actually delete (otherwise only counts)")
+    p.add_argument("--all", action="store_true", help="Allow an empty filter")
+
+    sub.add_parser("normalize", parents=[filters, common], help="Rewrite records into the scraper schema")
+    sub.add_parser("dedupe", parents=[filters, common], help="Merge duplicate records of the same program")
+    return parser
+
+
+COMMANDS = {
+    "import":    import_records,
+    "export":    export_records,
+    "update":    update_records,
+    "delete":    delete_records,
+    "normalize": normalize_records,
+    "dedupe":    dedupe_records,
+}
+
+
+async def interactive(collection):
     while True:
         print("\n🔧 Fellowship Tracker Manager")
         print("1. List Recent")
@@ -99,5 +588,16 @@ async def main():
         else:
             print("Invalid option.")
 
+async def main():
+    args = build_parser().parse_args()
+    collection = await get_db()
+    if collection is None:
+        return
+
+    if args.command:
+        await COMMANDS[args.command](collection, args)
+    else:
+        await interactive(collection)
+
 if __name__ == "__main__":
     asyncio.run(main())
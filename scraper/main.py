@@ -3,16 +3,23 @@ import re
 import json
 import asyncio
 import time
+import hashlib
 from pathlib import Path
-from datetime import datetime, timezone
-from urllib.parse import urlparse, urlunparse
+from datetime import datetime, timezone, timedelta
+from urllib.parse import urlparse
 
 import httpx
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReturnDocument
 from dotenv import load_dotenv
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, CacheMode
 from groq import Groq
 from scraper.discord import send_discord_notification
+from scraper.utils.bloom import BloomFilter, WATERMARK_FIELD, WRITE_STAMP
+from scraper.utils.features import build_features, refresh_features
+from scraper.utils.resolve import EntityResolver, freshest_fields
+from scraper.utils.failures import FailureLedger
+from scraper.utils.links import normalize_url, extract_outlinks
 
 # ─────────────────────────── ENV SETUP ───────────────────────────
 env_path = Path(__file__).parent.parent / '.env'
@@ -26,9 +33,13 @@ mongo_client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=5000)
 db           = mongo_client.fellowship_tracker
 collection   = db.fellowships
 discovered_collection = db.discovered_links
+query_stats_collection = db.query_stats
+query_cache_collection = db.query_cache
+failures_collection    = db.crawl_failures
 
 groq_client = Groq(api_key=GROQ_KEY)
 ai_lock = asyncio.Lock()
+resolve_lock = asyncio.Lock()
 
 GROQ_MODEL  = "llama-3.3-70b-versatile"
 
@@ -84,6 +95,18 @@ DISCOVERY_DOMAINS = [
     "https://outreachy.org",
 ]
 
+QUERY_BUDGET        = 80    # max Serper searches per run
+QUERY_RETIRE_AFTER  = 3     # runs without a single relevant link before a query is retired
+QUERY_RETIRE_DAYS   = 30    # retired queries get another run after this cooldown
+QUERY_EXPLORE_PRIOR = 1.0   # yield assumed for never-run queries so they get a first try
+
+BLOOM_DIR      = Path(os.getenv("BLOOM_DIR", Path(__file__).parent / ".cache"))
+BLOOM_CAPACITY = 500_000   # rebuilt at 2x the collection size once exceeded
+IN_QUERY_CHUNK = 1000      # max URLs per $in confirmation query
+
+OUTLINKS_PER_PAGE = 10     # best-scoring outlinks kept per crawled page
+OUTLINK_DOMAIN_WEIGHT = 0.1   # outlink rank per get_domain_score point above a neutral 50
+
 def ask_ai(prompt: str, max_tokens: int = 2048) -> str:
     """Call Groq with automatic retry on rate limits."""
     for attempt in range(4):
@@ -117,15 +140,73 @@ def safe_parse_json(raw: str):
         pass
     return None
 
-async def get_existing_urls() -> set:
-    """Fetch all URLs already stored in MongoDB."""
-    cursor = collection.find({}, {"apply_link": 1, "_id": 0})
-    existing = set()
+async def load_seen_filter(coll, name: str) -> BloomFilter:
+    """
+    Load the on-disk Bloom filter of apply_links (and merged source_urls)
+    in `coll` and fold in only documents written since it was last saved.
+    Rebuilds from scratch when the file is missing or the filter has
+    outgrown its capacity.
+    """
+    bloom = BloomFilter.load(BLOOM_DIR / f"{name}.bloom")
+    query = {}
+    if bloom is None or bloom.is_saturated:
+        capacity = max(BLOOM_CAPACITY, await coll.estimated_document_count() * 2)
+        bloom = BloomFilter(capacity=capacity)
+        print(f"Rebuilding {name} seen-filter (capacity {capacity})...")
+    elif bloom.watermark:
+        query = {WATERMARK_FIELD: {"$gte": bloom.watermark}}
+
+    added, watermark = 0, bloom.watermark
+    projection = {"apply_link": 1, "source_urls": 1, WATERMARK_FIELD: 1, "_id": 0}
+    cursor = coll.find(query, projection).batch_size(1000)
     async for doc in cursor:
-        if doc.get("apply_link"):
-            existing.add(doc["apply_link"])
-    print(f"Found {len(existing)} already-scraped URLs in DB.")
-    return existing
+        for url in [doc.get("apply_link")] + list(doc.get("source_urls") or []):
+            if url and not bloom.add(url):
+                added += 1
+        updated = doc.get(WATERMARK_FIELD)
+        if updated:
+            if updated.tzinfo is None:
+                updated = updated.replace(tzinfo=timezone.utc)
+            if watermark is None or updated > watermark:
+                watermark = updated
+    bloom.watermark = watermark
+    print(f"{name} seen-filter: {len(bloom)} URLs ({added} new since last run).")
+    return bloom
+
+
+def save_seen_filter(bloom: BloomFilter, name: str):
+    bloom.save(BLOOM_DIR / f"{name}.bloom")
+
+
+async def find_known_urls(coll, bloom: BloomFilter, urls: list[str],
+                          fields: tuple[str, ...] = ("apply_link",)) -> set:
+    """
+    Exact "already stored?" check. Bloom misses are definitely new, so only
+    the filter's positive hits are confirmed with batched $in queries
+    against each of `fields`.
+    """
+    positives = [u for u in dict.fromkeys(urls) if u in bloom]
+    known = set()
+    for i in range(0, len(positives), IN_QUERY_CHUNK):
+        chunk  = positives[i:i + IN_QUERY_CHUNK]
+        wanted = set(chunk)
+        query  = {"$or": [{f: {"$in": chunk}} for f in fields]}
+        cursor = coll.find(query, {f: 1 for f in fields} | {"_id": 0})
+        async for doc in cursor:
+            for f in fields:
+                values = doc.get(f) or []
+                known.update(v for v in ([values] if isinstance(values, str) else values) if v in wanted)
+    return known
+
+
+async def load_resolver() -> EntityResolver:
+    """Index every stored program so new extractions can be matched to it."""
+    resolver = EntityResolver()
+    projection = {"name": 1, "organization": 1, "apply_link": 1, "source_urls": 1}
+    async for doc in collection.find({}, projection).batch_size(1000):
+        resolver.add(doc["_id"], doc)
+    print(f"Entity index: {len(resolver.entities)} programs.")
+    return resolver
 
 
 # ─────────────────────────── DOMAIN SCORING ──────────────────────
@@ -150,11 +231,6 @@ def is_link_allowed(url: str) -> bool:
     if u.endswith((".pdf", ".doc", ".docx", ".zip")): return False
     return True
 
-def normalize_url(url: str) -> str:
-    parsed = urlparse(url)
-    clean = parsed._replace(query="", fragment="")
-    return urlunparse(clean).rstrip("/")
-
 def generate_queries_with_ai() -> list[dict]:
     print("\nGemini is generating search queries...")
     programs_list = "\n".join(f"- {p}" for p in MUST_HAVE_PROGRAMS)
@@ -184,19 +260,151 @@ Return ONLY this JSON with no extra text or markdown:
     raw = ask_ai(prompt, max_tokens=3000)
     if not raw:
         print("Gemini unavailable, using fallback queries.")
-        return [{"name": p, "queries": [f"{p} 2026 official application", f"{p} deadline 2026"]}
-                for p in MUST_HAVE_PROGRAMS]
+        return None
 
     data = safe_parse_json(raw)
     if not data or not isinstance(data, dict):
         print("JSON parse failed, using fallback queries.")
-        return [{"name": p, "queries": [f"{p} 2026 official application", f"{p} deadline 2026"]}
-                for p in MUST_HAVE_PROGRAMS]
+        return None
 
-    combined = data.get("must_have", []) + data.get("additional", [])
+    combined = [{**p, "must_have": True} for p in data.get("must_have", [])] + data.get("additional", [])
     print(f"Generated queries for {len(combined)} programs.")
     return combined
 
+
+def fallback_queries() -> list[dict]:
+    return [{"name": p, "queries": [f"{p} 2026 official application", f"{p} deadline 2026"], "must_have": True}
+            for p in MUST_HAVE_PROGRAMS]
+
+
+def programs_hash() -> str:
+    return hashlib.sha256(json.dumps(MUST_HAVE_PROGRAMS).encode("utf-8")).hexdigest()
+
+
+async def get_program_queries() -> list[dict]:
+    """
+    Reuse the AI-generated query set while MUST_HAVE_PROGRAMS is unchanged,
+    so the 3000-token generation call only runs when the list is edited. The
+    query strings stay stable, which keeps their query_stats history usable.
+    """
+    key    = programs_hash()
+    cached = await query_cache_collection.find_one({"_id": key})
+    if cached:
+        print(f"\nUsing cached queries for {len(cached['programs'])} programs.")
+        return cached["programs"]
+
+    programs = generate_queries_with_ai()
+    if not programs:
+        return fallback_queries()
+
+    await query_cache_collection.replace_one(
+        {"_id": key},
+        {"_id": key, "programs": programs, "created_at": datetime.now(timezone.utc)},
+        upsert=True,
+    )
+    return programs
+
+
+async def get_query_stats() -> dict[str, dict]:
+    stats = {}
+    async for doc in query_stats_collection.find({}, {"_id": 0}):
+        stats[doc["query"]] = doc
+    return stats
+
+
+def query_yield(stat: dict | None) -> float:
+    """
+    Average value per run: saved records count most, then kept links and
+    hits on already-stored pages (the query still finds its program), raw
+    new links least.
+    """
+    if not stat or not stat.get("runs"):
+        return QUERY_EXPLORE_PRIOR
+    value = (stat.get("saved", 0) * 5 + stat.get("kept", 0) + stat.get("known", 0)
+             + stat.get("new_links", 0) * 0.2)
+    return value / stat["runs"]
+
+
+def is_query_retired(stat: dict | None) -> bool:
+    """
+    Retire only queries that never return anything relevant. Hits on pages
+    already stored ("known") count as relevant: a must-have query whose
+    results are saved is still the one that finds next cycle's page.
+    """
+    if not stat:
+        return False
+    if stat.get("kept", 0) or stat.get("saved", 0) or stat.get("known", 0):
+        return False
+    if stat.get("runs", 0) < QUERY_RETIRE_AFTER:
+        return False
+    last_run = stat.get("last_run")
+    if last_run:
+        if last_run.tzinfo is None:
+            last_run = last_run.replace(tzinfo=timezone.utc)
+        if datetime.now(timezone.utc) - last_run > timedelta(days=QUERY_RETIRE_DAYS):
+            return False
+    return True
+
+
+def plan_queries(programs: list[dict], stats: dict[str, dict], budget: int = QUERY_BUDGET) -> list[tuple[str, dict]]:
+    """
+    Flatten every program's queries, drop duplicates and retired ones,
+    and keep the `budget` highest-yield queries (best first). Each
+    must-have program is always given its best query, so a program can't
+    be starved out of the plan.
+    """
+    seen, candidates, retired = set(), [], 0
+    for prog in programs:
+        for query in prog.get("queries", []):
+            query = query.strip()
+            if not query or query.lower() in seen:
+                continue
+            seen.add(query.lower())
+            stat = stats.get(query)
+            if is_query_retired(stat):
+                retired += 1
+                continue
+            candidates.append((query_yield(stat), query, prog))
+
+    candidates.sort(key=lambda x: x[0], reverse=True)
+    reserved, covered = [], set()
+    for cand in candidates:
+        name = cand[2].get("name")
+        if cand[2].get("must_have") and name not in covered:
+            covered.add(name)
+            reserved.append(cand)
+    reserved = reserved[:budget]
+    taken    = {query for _, query, _ in reserved}
+    rest     = [c for c in candidates if c[1] not in taken][:budget - len(reserved)]
+    planned = [(query, prog) for _, query, prog in sorted(reserved + rest, key=lambda x: x[0], reverse=True)]
+    print(f"Planned {len(planned)} queries (budget {budget}, {retired} retired, "
+          f"{max(len(candidates) - budget, 0)} deferred).")
+    return planned
+
+
+async def record_query_yields(query_links: dict[str, list[str]], known_urls: set,
+                              crawled_urls: set, saved_urls: set):
+    """
+    Persist per-query yield for this run: hits on already-stored pages,
+    new links, links kept for crawling and records saved.
+    """
+    now = datetime.now(timezone.utc)
+    ops = []
+    for query, links in query_links.items():
+        new_links = [l for l in links if l not in known_urls]
+        known     = len(links) - len(new_links)
+        kept      = sum(1 for l in new_links if l in crawled_urls)
+        saved     = sum(1 for l in new_links if l in saved_urls)
+        ops.append(UpdateOne(
+            {"query": query},
+            {"$inc": {"runs": 1, "known": known, "new_links": len(new_links), "kept": kept, "saved": saved},
+             "$set": {"last_run": now, "last_saved": saved}},
+            upsert=True,
+        ))
+    if ops:
+        await query_stats_collection.bulk_write(ops, ordered=False)
+        print(f"Recorded yield for {len(ops)} queries.")
+
 async def serper_search(query: str, client: httpx.AsyncClient) -> list[str]:
     headers = {"X-API-KEY": SERPER_KEY, "Content-Type": "application/json"}
     try:
@@ -216,25 +424,31 @@ async def serper_search(query: str, client: httpx.AsyncClient) -> list[str]:
         return []
 
 
-async def collect_links(programs: list[dict]) -> list[tuple[int, str]]:
+async def collect_links(planned: list[tuple[str, dict]]) -> tuple[list[tuple[int, str]], dict[str, list[str]]]:
+    """
+    Run the planned searches. Also returns, per query, the links it was
+    first to find so yields can be credited to the query that earned them.
+    """
     seen, scored = set(), []
+    query_links = {}
     async with httpx.AsyncClient() as http:
-        for prog in programs:
-            print(f"Searching: {prog['name']}")
-            for query in prog.get("queries", []):
-                for link in await serper_search(query, http):
-                    link = normalize_url(link)
-                    if link not in seen:
-                        seen.add(link)
-                        score = get_domain_score(link)
-                        hint = prog.get("official_domain_hint", "")
-                        if hint and hint.lower() in link.lower():
-                            score = min(score + 15, 100)
-                        scored.append((score, link))
-                await asyncio.sleep(0.5)
+        for query, prog in planned:
+            print(f"Searching: {prog['name']}  |  {query}")
+            query_links[query] = []
+            for link in await serper_search(query, http):
+                link = normalize_url(link)
+                if link not in seen:
+                    seen.add(link)
+                    query_links[query].append(link)
+                    score = get_domain_score(link)
+                    hint = prog.get("official_domain_hint", "")
+                    if hint and hint.lower() in link.lower():
+                        score = min(score + 15, 100)
+                    scored.append((score, link))
+            await asyncio.sleep(0.5)
     scored.sort(key=lambda x: x[0], reverse=True)
     print(f"\nCollected {len(scored)} unique links.\n")
-    return scored
+    return scored, query_links
 
 def deduplicate_by_domain(scored_links: list[tuple[int, str]], max_per_domain: int = 1) -> list[tuple[int, str]]:
     """
@@ -343,52 +557,79 @@ URLs:
 
 
 
-async def process_link(crawler, run_cfg, link: str, score: int, semaphore: asyncio.Semaphore):
+async def process_link(crawler, run_cfg, link: str, score: int, semaphore: asyncio.Semaphore,
+                       seen_pages: BloomFilter, seen_outlinks: BloomFilter,
+                       resolver: EntityResolver, ledger: FailureLedger) -> bool:
+    """Crawl, extract and store one page. Returns True if a record was saved."""
     async with semaphore:
+        # re-checked here: the host breaker may have tripped while this task waited
+        reason = ledger.is_suppressed(link)
+        if reason:
+            print(f"Skipping ({reason}): {link}")
+            return False
+
+        crawled = False
         try:
             result = await asyncio.wait_for(
                 crawler.arun(url=link, config=run_cfg), timeout=60.0
             )
-            if not result.success or len(result.markdown) < 300:
-                return
+            crawled = True
+            status = getattr(result, "status_code", None)
+            if not result.success or (status and status >= 400):
+                await ledger.record_failure(link, status, (result.error_message or "")[:200] or None)
+                return False
+            await ledger.record_success(link)
+            if len(result.markdown) < 300:
+                return False
             if score < 80 and result.markdown.count("](") > 80:
                 print(f"Skipping aggregator: {link}")
-                return
+                return False
             
-            links = re.findall(r'https?://[^\s)"]+', result.markdown)
-
-            for l in links[:10]:
-
-                l = normalize_url(l)
-
+            # anchor/path/same-site score plus the domain's trust, filtered before the top-K cut
+            ranked = []
+            for link_score, l, anchor in extract_outlinks(result, link):
                 if not is_link_allowed(l):
                     continue
-
-                if get_domain_score(l) < 50:
+                domain_score = get_domain_score(l)
+                if domain_score < 50:
                     continue
-
-                await discovered_collection.update_one(
-                    {"apply_link": l},
-                    {"$setOnInsert": {
-                    "name": "Discovered Page",
-                    "apply_link": l,
-                    "trust_score": score - 10,
-                    "last_updated": datetime.now(timezone.utc)
-                }},
-                upsert=True
-                )
+                ranked.append((link_score + (domain_score - 50) * OUTLINK_DOMAIN_WEIGHT, l, anchor))
+            ranked.sort(key=lambda x: x[0], reverse=True)
+            outlinks = {l: (round(rank, 2), anchor) for rank, l, anchor in ranked[:OUTLINKS_PER_PAGE]}
+
+            known    = await find_known_urls(discovered_collection, seen_outlinks, list(outlinks))
+            new_outs = [l for l in outlinks if l not in known]
+            if new_outs:
+                await discovered_collection.bulk_write([
+                    UpdateOne(
+                        {"apply_link": l},
+                        {"$setOnInsert": {
+                            "name": "Discovered Page",
+                            "apply_link": l,
+                            "anchor_text": outlinks[l][1][:200],
+                            "link_score": outlinks[l][0],
+                            "source_page": link,
+                            "trust_score": score - 10,
+                            "last_updated": datetime.now(timezone.utc)
+                        }, **WRITE_STAMP},
+                        upsert=True,
+                    )
+                    for l in new_outs
+                ], ordered=False)
+            for l in new_outs:
+                seen_outlinks.add(l)
             async with ai_lock:
                 details = ai_extract_details(result.markdown, link)
 
             if not details.get("is_opportunity"):
                 print(f"Skipping non-opportunity page: {link}")
-                return
+                return False
 
             details.pop("is_opportunity", None)
 
             await asyncio.sleep(1)
             if not details:
-                return
+                return False
 
             is_open = details.get("is_open")
             if isinstance(is_open, str):
@@ -404,23 +645,65 @@ async def process_link(crawler, run_cfg, link: str, score: int, semaphore: async
                 "eligibility":  details.get("eligibility"),
                 "mode":         details.get("mode"),
                 "is_open":      is_open,
-                "tags":         details.get("tags", []),
+                "tags":         details.get("tags") if isinstance(details.get("tags"), list) else [],
                 "apply_link":   link,
                 "trust_score":  score,
                 "last_updated": datetime.now(timezone.utc),
             }
-            result_db = await collection.update_one({"apply_link": link}, {"$set": doc}, upsert=True)
+            doc["features"] = build_features({**details, **doc})
+
+            # Timeline/FAQ/apply pages of one program resolve to a single canonical record
+            async with resolve_lock:
+                merged = None
+                while merged is None and (match_id := resolver.match(doc)) is not None:
+                    merged = await collection.find_one_and_update(
+                        {"_id": match_id},
+                        {"$set": {**freshest_fields(doc), "last_updated": doc["last_updated"]},
+                         "$addToSet": {"source_urls": link, "tags": {"$each": doc["tags"]}},
+                         "$max": {"trust_score": score}, **WRITE_STAMP},
+                        return_document=ReturnDocument.AFTER,
+                    )
+                    if merged is None:
+                        # deleted or deduped away since the index was loaded; try the next best
+                        resolver.remove(match_id)
+
+                if merged is not None:
+                    # features follow the merged fields; the page's own degree/location
+                    # lists win, otherwise the canonical record's are kept
+                    features = refresh_features({**merged,
+                                                 "degree_levels": details.get("degree_levels"),
+                                                 "locations":     details.get("locations")})
+                    await collection.update_one({"_id": match_id}, {"$set": {"features": features}})
+                    resolver.add(match_id, doc)
+                else:
+                    result_db = await collection.update_one(
+                        {"apply_link": link},
+                        {"$set": doc, "$addToSet": {"source_urls": link}, **WRITE_STAMP},
+                        upsert=True,
+                    )
+                    if result_db.upserted_id is not None:
+                        resolver.add(result_db.upserted_id, doc)
+            seen_pages.add(link)
+
+            if merged is not None:
+                print(f"Merged: {doc['name']}  |  {link} into existing program")
+                return True
 
             if result_db.upserted_id is not None:
               print(f"New opportunity! Sending Discord notification...")
               await send_discord_notification(doc)
 
             print(f"Saved: {doc['name']}  |  Deadline: {doc['deadline']}")
+            return True
 
         except asyncio.TimeoutError:
             print(f"Timeout: {link}")
+            await ledger.record_failure(link, None, "TimeoutError")
         except Exception as e:
             print(f"Error ({link}): {e}")
+            if not crawled:
+                await ledger.record_failure(link, None, e.__class__.__name__)
+        return False
 
 def ai_extract_details(page_text: str, url: str) -> dict:
 
@@ -443,9 +726,14 @@ Otherwise return:
   "stipend": "Amount or Unpaid or Not Specified",
   "eligibility": "1-2 sentence summary",
   "mode": "Remote or In-Person or Hybrid",
-  "tags": ["tag1", "tag2"]
+  "tags": ["tag1", "tag2"],
+  "degree_levels": ["ug", "pg", "phd"],
+  "locations": ["Cities or countries applicants must be in, or [] if open to all"]
 }}
 
+degree_levels lists only the levels that are eligible (ug = undergraduate,
+pg = masters, phd = doctoral); use [] if not stated.
+
 URL:
 {url}
 
@@ -468,6 +756,14 @@ Content:
 async def ensure_indexes():
     await collection.create_index("apply_link", unique=True)
     await collection.create_index("last_updated")
+    await collection.create_index(WATERMARK_FIELD)
+    await collection.create_index("source_urls")
+    await failures_collection.create_index("key", unique=True)
+    await failures_collection.create_index("next_retry")
+    await discovered_collection.create_index("apply_link")
+    await discovered_collection.create_index("last_updated")
+    await discovered_collection.create_index(WATERMARK_FIELD)
+    await query_stats_collection.create_index("query", unique=True)
 
 async def ping_mongo():
     await mongo_client.admin.command("ping")
@@ -480,7 +776,7 @@ async def main():
     print(f"  Model: {GROQ_MODEL}")
     print("=" * 60)
 
-    programs     = generate_queries_with_ai()
+    programs     = await get_program_queries()
 
     for q in DISCOVERY_QUERIES:
         programs.append({
@@ -495,8 +791,10 @@ async def main():
         "queries": [q],
         "official_domain_hint": ""
     })
+    planned = plan_queries(programs, await get_query_stats())
+
     print("\n Running web searches...\n")
-    scored_links = await collect_links(programs)
+    scored_links, query_links = await collect_links(planned)
 
     if not scored_links:
         print(" No links found. Check SERPER_API_KEY in .env")
@@ -508,11 +806,26 @@ async def main():
             scored_links.append((85, normalize_url(path)))
 
     scored_links = list(set(scored_links))
-    existing_urls = await get_existing_urls()
+    seen_pages    = await load_seen_filter(collection, "fellowships")
+    seen_outlinks = await load_seen_filter(discovered_collection, "discovered_links")
+    existing_urls = await find_known_urls(collection, seen_pages, [url for _, url in scored_links],
+                                          fields=("apply_link", "source_urls"))
     
+    # for query yields: checked over every search hit (not just those that survived
+    # domain dedup) and before crawling, so this run's saves don't count as known
+    all_hits   = [l for links in query_links.values() for l in links]
+    known_urls = await find_known_urls(collection, seen_pages, all_hits,
+                                       fields=("apply_link", "source_urls"))
+
     fresh_links = [(sc, url) for sc, url in scored_links if url not in existing_urls]
     print(f" {len(fresh_links)} new links to process ({len(scored_links) - len(fresh_links)} already in DB, skipping)\n")
 
+    ledger = FailureLedger(failures_collection)
+    await ledger.load()
+    live_links  = [(sc, url) for sc, url in fresh_links if not ledger.is_suppressed(url)]
+    print(f" {len(fresh_links) - len(live_links)} links suppressed by the failure ledger\n")
+    fresh_links = live_links
+
     top_urls   = [url for _, url in fresh_links[:150]]
     final_urls = top_urls
     score_map  = {url: sc for sc, url in scored_links}
@@ -527,12 +840,21 @@ async def main():
         delay_before_return_html=2.0,
     )
 
+    resolver = await load_resolver()
+
     async with AsyncWebCrawler() as crawler:
         tasks = [
-            process_link(crawler, run_cfg, url, score_map.get(url, 50), semaphore)
+            process_link(crawler, run_cfg, url, score_map.get(url, 50), semaphore,
+                         seen_pages, seen_outlinks, resolver, ledger)
             for url in final_urls
         ]
-        await asyncio.gather(*tasks)
+        saved = await asyncio.gather(*tasks)
+
+    save_seen_filter(seen_pages, "fellowships")
+    save_seen_filter(seen_outlinks, "discovered_links")
+
+    saved_urls = {url for url, ok in zip(final_urls, saved) if ok}
+    await record_query_yields(query_links, known_urls, set(final_urls), saved_urls)
 
     print("\n Done! Database updated.")
 
@@ -0,0 +1,100 @@
+import math
+import struct
+import hashlib
+from pathlib import Path
+from datetime import datetime, timezone
+
+# magic, bit count, hash count, item count, capacity, watermark (epoch seconds)
+_HEADER = struct.Struct("<4sQIQQd")
+_MAGIC  = b"BLM1"
+
+# Server-side write time stamped on every fellowships/discovered_links write
+# (via WRITE_STAMP). Unlike last_updated it can't be backdated by imports or
+# merges, so it is safe to use as the incremental-refresh watermark.
+WATERMARK_FIELD = "written_at"
+WRITE_STAMP     = {"$currentDate": {WATERMARK_FIELD: True}}
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter for "have we seen this URL?" checks.
+
+    False positives are possible (callers confirm those against MongoDB),
+    false negatives are not. `watermark` records the newest written_at
+    already folded in, so a reload only has to add documents written since.
+    """
+
+    def __init__(self, capacity: int = 500_000, error_rate: float = 0.01):
+        self.capacity   = capacity
+        self.error_rate = error_rate
+        self.num_bits   = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits       = bytearray((self.num_bits + 7) // 8)
+        self.count      = 0
+        self.watermark  = None
+
+    def _positions(self, item: str):
+        # Kirsch–Mitzenmacher double hashing: two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> bool:
+        """Add item; returns True if it was (probably) already present."""
+        present = True
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def is_saturated(self) -> bool:
+        return self.count > self.capacity
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        watermark = self.watermark.timestamp() if self.watermark else 0.0
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.num_bits, self.num_hashes,
+                                 self.count, self.capacity, watermark))
+            f.write(self.bits)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BloomFilter | None":
+        """Return the filter stored at path, or None if missing/corrupt."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return None
+            magic, num_bits, num_hashes, count, capacity, watermark = _HEADER.unpack(header)
+            bits = f.read()
+        if magic != _MAGIC or len(bits) != (num_bits + 7) // 8:
+            return None
+
+        bloom = cls.__new__(cls)
+        bloom.capacity   = capacity
+        bloom.error_rate = None
+        bloom.num_bits   = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits       = bytearray(bits)
+        bloom.count      = count
+        bloom.watermark  = datetime.fromtimestamp(watermark, timezone.utc) if watermark else None
+        return bloom
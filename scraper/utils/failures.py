@@ -0,0 +1,93 @@
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+from urllib.parse import urlparse
+
+from pymongo import ReturnDocument
+
+BACKOFF_BASE      = timedelta(hours=6)
+BACKOFF_BASE_GONE = timedelta(days=1)    # 404/410: the page is probably not coming back soon
+BACKOFF_MAX       = timedelta(days=30)
+HOST_TRIP         = 3                    # consecutive host-side failures in one run that open a host's breaker
+
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc.lower().removeprefix("www.")
+
+
+def is_host_failure(status: int | None) -> bool:
+    """Timeouts, connection errors and 5xx say the host is struggling; a 404 only says the page is gone."""
+    return status is None or status >= 500
+
+
+def backoff(failures: int, status: int | None = None) -> timedelta:
+    base = BACKOFF_BASE_GONE if status in (404, 410) else BACKOFF_BASE
+    return min(base * (2 ** max(failures - 1, 0)), BACKOFF_MAX)
+
+
+class FailureLedger:
+    """
+    Persistent record of URLs that keep failing to crawl.
+
+    Each failing URL gets a document with its last status/error,
+    consecutive failure count and next_retry time, and the scheduler skips
+    it until next_retry. Hosts are only ever blocked within a run: a
+    circuit breaker stops crawling a host after HOST_TRIP consecutive
+    timeouts/5xx, and resets on the next run.
+    """
+
+    def __init__(self, coll):
+        self.coll         = coll
+        self.blocked_urls = set()
+        self.failing      = set()               # URLs with a ledger entry, cleared on success
+        self.run_failures = defaultdict(int)    # host -> consecutive host-side failures this run
+
+    async def load(self):
+        now = datetime.now(timezone.utc)
+        async for doc in self.coll.find({"kind": "url"}, {"key": 1, "next_retry": 1, "_id": 0}):
+            self.failing.add(doc["key"])
+            retry = doc.get("next_retry")
+            if retry and retry.tzinfo is None:
+                retry = retry.replace(tzinfo=timezone.utc)
+            if retry and retry > now:
+                self.blocked_urls.add(doc["key"])
+        print(f"Failure ledger: {len(self.blocked_urls)} URLs suppressed.")
+
+    def is_suppressed(self, url: str) -> str | None:
+        """Reason the URL should be skipped right now, or None."""
+        host = _host(url)
+        if url in self.blocked_urls:
+            return "backing off"
+        if self.run_failures[host] >= HOST_TRIP:
+            return "host circuit open"
+        return None
+
+    async def _bump(self, url: str, host: str, status: int | None, error: str | None) -> int:
+        now = datetime.now(timezone.utc)
+        doc = await self.coll.find_one_and_update(
+            {"key": url},
+            {"$inc": {"failures": 1},
+             "$set": {"kind": "url", "host": host, "status": status, "error": error, "last_failure": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        failures = doc["failures"]
+        await self.coll.update_one({"key": url}, {"$set": {"next_retry": now + backoff(failures, status)}})
+        self.failing.add(url)
+        return failures
+
+    async def record_failure(self, url: str, status: int | None = None, error: str | None = None):
+        host = _host(url)
+        failures = await self._bump(url, host, status, error)
+        self.blocked_urls.add(url)
+
+        if is_host_failure(status):
+            self.run_failures[host] += 1
+            if self.run_failures[host] == HOST_TRIP:
+                print(f"Circuit open for {host}, skipping its remaining URLs this run.")
+        print(f"  ↳ failure #{failures} for {url}, retry in {backoff(failures, status)}")
+
+    async def record_success(self, url: str):
+        self.run_failures[_host(url)] = 0
+        if url in self.failing:
+            await self.coll.delete_many({"key": url})
+            self.failing.discard(url)
@@ -0,0 +1,206 @@
+import re
+from datetime import datetime
+
+FEATURES_VERSION = 2
+
+DEGREE_KEYWORDS = {
+    "ug":  ["undergraduate", "under-graduate", "b.tech", "btech", "b.e.", "b.e", "bachelor",
+            "bachelors", "b.sc", "bsc", "ug"],
+    "pg":  ["postgraduate", "post-graduate", "m.tech", "mtech", "master", "masters", "m.sc", "msc",
+            "m.e.", "m.s.", "mca", "pg"],
+    "phd": ["phd", "ph.d", "doctoral", "doctorate"],
+}
+
+# canonical domain -> words that imply it (matched against tags, name and eligibility)
+DOMAIN_KEYWORDS = {
+    "ai-ml":                ["ai", "ml", "machine learning", "artificial intelligence", "deep learning",
+                             "nlp", "computer vision", "ai/ml", "ai-ml"],
+    "open-source":          ["open source", "open-source", "oss", "foss", "gsoc"],
+    "research":             ["research", "srf", "surge", "spark"],
+    "software-engineering": ["software", "developer", "programming", "swe"],
+    "data-science":         ["data science", "data-science", "analytics", "data engineering"],
+    "security":             ["security", "cybersecurity", "cryptography"],
+    "web3":                 ["bitcoin", "blockchain", "web3", "crypto"],
+    "systems":              ["systems", "cloud", "kubernetes", "cncf", "linux", "devops"],
+}
+
+USD_TO_INR = 85
+# monthly INR upper bounds for each band
+STIPEND_BANDS = [("low", 10_000), ("mid", 50_000), ("high", float("inf"))]
+TOTAL_STIPEND_MONTHS = 3   # "total"/"one-time" with no duration: assume a typical summer program
+
+_AMOUNT   = r"(\d[\d,]*(?:\.\d+)?)\s*(k|lakhs?|lpa)?"
+_CURRENCY = r"(₹|rs\.?|inr|\$|usd)"
+# amounts written next to a currency marker: "$3000", "INR 60,000", "3000 usd"
+_PRICED   = re.compile(rf"{_CURRENCY}\s*{_AMOUNT}|{_AMOUNT}\s*(inr|usd|rupees|dollars|/-)")
+_DURATION = re.compile(r"(\d+)\s*(week|month)s?")
+_PER      = r"(?:\bper\b|/|\ban?\b|\bevery\b)\s*"
+
+# whole-word matches only, so "debug" isn't "ug" and "masterclass" isn't "master"
+_DEGREE_PATTERNS = {
+    degree: re.compile(r"(?<![a-z])(?:" + "|".join(re.escape(w) for w in words) + r")(?![a-z])")
+    for degree, words in DEGREE_KEYWORDS.items()
+}
+
+
+def _text(*parts) -> str:
+    return " ".join(str(p) for p in parts if p).lower()
+
+
+def _degrees(details: dict) -> list[str]:
+    levels = details.get("degree_levels")
+    if isinstance(levels, list):
+        levels = [l.lower() for l in levels if isinstance(l, str) and l.lower() in DEGREE_KEYWORDS]
+        if levels:
+            return sorted(set(levels))
+    text = _text(details.get("name"), details.get("eligibility"))
+    return sorted(d for d, pattern in _DEGREE_PATTERNS.items() if pattern.search(text))
+
+
+def _locations(details: dict) -> list[str]:
+    locations = details.get("locations")
+    if isinstance(locations, str):
+        locations = [locations]
+    if not isinstance(locations, list):
+        return []
+    cleaned = {l.strip().lower() for l in locations if isinstance(l, str) and l.strip()}
+    cleaned.discard("remote")
+    return sorted(cleaned)
+
+
+def _domains(details: dict) -> list[str]:
+    tags = [t.lower() for t in details.get("tags") or [] if isinstance(t, str)]
+    text = _text(details.get("name"), details.get("eligibility"), " ".join(tags))
+    found = set()
+    for domain, words in DOMAIN_KEYWORDS.items():
+        if domain in tags or any(re.search(rf"\b{re.escape(w)}\b", text) for w in words):
+            found.add(domain)
+    return sorted(found)
+
+
+def _amount(text: str) -> tuple[float, bool] | None:
+    """
+    (amount, is_usd) for the stipend figure: the number next to a currency
+    marker, else the first number that isn't a duration ("12 weeks").
+    """
+    priced = _PRICED.search(text)
+    if priced:
+        currency, number, unit, number2, unit2, currency2 = priced.groups()
+        number, unit, currency = number or number2, unit or unit2, currency or currency2
+    else:
+        durations = {m.start() for m in _DURATION.finditer(text)}
+        bare = next((m for m in re.finditer(_AMOUNT, text) if m.start() not in durations), None)
+        if not bare:
+            return None
+        (number, unit), currency = bare.groups(), ""
+    try:
+        amount = float(number.replace(",", ""))
+    except ValueError:
+        return None
+    if unit == "k":
+        amount *= 1_000
+    elif unit:
+        amount *= 100_000
+    if currency:
+        return amount, currency in ("$", "usd", "dollars")
+    return amount, "usd" in text or "$" in text
+
+
+def _monthly(amount: float, text: str) -> float:
+    """Normalize an amount to per-month using the rate or duration the text states."""
+    if re.search(rf"{_PER}(year|annum)|annual|yearly|p\.a\.|lpa", text):
+        return amount / 12
+    if re.search(rf"{_PER}week|weekly", text):
+        return amount * 4
+    if re.search(rf"{_PER}(month|mo)\b|monthly|p\.m\.", text):
+        return amount
+    # no rate given: an amount for "12 weeks" / "3 months" is a total for that span
+    duration = _DURATION.search(text)
+    if duration:
+        n = int(duration.group(1))
+        months = n / 4.33 if duration.group(2) == "week" else n
+        return amount / max(months, 1)
+    if any(w in text for w in ("total", "one-time", "one time", "lump")):
+        return amount / TOTAL_STIPEND_MONTHS
+    return amount
+
+
+def stipend_band(stipend) -> str:
+    """
+    Bucket a free-text stipend into none / low / mid / high / unknown (monthly INR).
+
+    >>> stipend_band("12 weeks, $3000")
+    'high'
+    >>> stipend_band("USD 1500 total")
+    'mid'
+    >>> stipend_band("INR 5,000 total")
+    'low'
+    >>> stipend_band("Rs. 10,000 per month for 8 weeks")
+    'mid'
+    >>> stipend_band("4 LPA")
+    'mid'
+    >>> stipend_band("$500/week")
+    'high'
+    """
+    text = _text(stipend)
+    if not text or "not specified" in text or text in ("null", "none", "n/a"):
+        return "unknown"
+    if "unpaid" in text or text.strip() in ("0", "no stipend"):
+        return "none"
+
+    found = _amount(text)
+    if not found:
+        return "unknown"
+    amount, is_usd = found
+    if is_usd:
+        amount *= USD_TO_INR
+    amount = _monthly(amount, text)
+
+    for band, upper in STIPEND_BANDS:
+        if amount < upper:
+            return band
+    return "high"
+
+
+def _deadline(deadline) -> str | None:
+    try:
+        return datetime.strptime(str(deadline).strip(), "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        return None
+
+
+def build_features(details: dict) -> dict:
+    """
+    Compact, structured eligibility features for one opportunity, computed
+    once at extraction time so ranking for any profile needs no LLM call.
+    Empty degree/location lists mean "no restriction found".
+    """
+    mode = _text(details.get("mode"))
+    return {
+        "degrees":      _degrees(details),
+        "locations":    _locations(details),
+        "remote":       "remote" in mode or "online" in mode,
+        "domains":      _domains(details),
+        "stipend_band": stipend_band(details.get("stipend")),
+        "deadline":     _deadline(details.get("deadline")),
+        "version":      FEATURES_VERSION,
+    }
+
+
+# stored fields build_features reads; changing any of them makes the features block stale
+FEATURE_SOURCE_FIELDS = {"name", "eligibility", "mode", "stipend", "deadline", "tags",
+                         "degree_levels", "locations"}
+
+
+def refresh_features(doc: dict) -> dict:
+    """
+    Rebuild features for a stored record. Degree/location lists come from
+    the LLM at extraction time and aren't stored elsewhere, so unless the
+    record carries new ones they are kept from its previous features block.
+    """
+    previous = doc.get("features") if isinstance(doc.get("features"), dict) else {}
+    return build_features({
+        **doc,
+        "degree_levels": doc.get("degree_levels") or previous.get("degrees"),
+        "locations":     doc.get("locations") or previous.get("locations"),
+    })
@@ -0,0 +1,105 @@
+import re
+from urllib.parse import urljoin, urlparse, urlunparse
+
+# anchor text words that point at the pages we actually want
+ANCHOR_KEYWORDS = {
+    "how to apply": 6, "apply": 5, "eligibility": 5, "application": 4, "deadline": 4,
+    "important dates": 4, "timeline": 4, "fellowship": 4, "internship": 4,
+    "scholarship": 4, "mentorship": 4, "call for": 3, "register": 3, "selection": 2,
+    "program": 2, "programme": 2, "research": 2, "students": 2, "faq": 1,
+}
+PATH_KEYWORDS = {
+    "apply": 3, "eligibility": 3, "fellowship": 3, "internship": 3, "scholarship": 3,
+    "mentorship": 3, "timeline": 2, "program": 2, "programme": 2, "students": 2,
+    "research": 1, "faq": 1,
+}
+# nav/footer/boilerplate that eats the link budget
+NOISE_KEYWORDS = [
+    "login", "log in", "sign in", "signin", "sign up", "signup", "privacy", "terms",
+    "cookie", "contact", "about us", "sitemap", "donate", "careers at",
+    "newsletter", "subscribe", "tweet", "copyright", "accessibility",
+]
+SAME_SITE_BONUS = 2
+MIN_LINK_SCORE  = 0   # only noise (net negative) links are dropped; keyword-less links still rank
+
+_MD_LINK = re.compile(r"\[([^\]]*)\]\((\S+?)(?:\s+\"[^\"]*\")?\)")
+_BARE    = re.compile(r"https?://[^\s)\"'<>\]]+")
+
+
+def normalize_url(url: str, keep_query: bool = False) -> str:
+    """
+    Dedup key for a URL. Crawled links drop the query string (tracking
+    params); curated links keep it, since e.g. ?program=srfp vs ?program=srip
+    are different pages.
+    """
+    parsed = urlparse(url.strip())
+    clean = parsed._replace(fragment="") if keep_query else parsed._replace(query="", fragment="")
+    return urlunparse(clean).rstrip("/")
+
+
+def _site(host: str) -> str:
+    """Crude registrable domain: last two labels, three for ccTLD pairs like ac.in."""
+    parts = host.lower().removeprefix("www.").split(".")
+    if len(parts) >= 3 and len(parts[-1]) == 2 and parts[-2] in ("ac", "co", "edu", "gov", "org", "res", "nic"):
+        return ".".join(parts[-3:])
+    return ".".join(parts[-2:])
+
+
+def _raw_links(result) -> list[tuple[str, str]]:
+    """(href, anchor text) pairs from the crawl result, falling back to the markdown."""
+    links = getattr(result, "links", None) or {}
+    pairs = [
+        (l.get("href", ""), (l.get("text") or l.get("title") or "").strip())
+        for kind in ("internal", "external")
+        for l in links.get(kind, []) or []
+        if isinstance(l, dict)
+    ]
+    if pairs:
+        return pairs
+
+    markdown = getattr(result, "markdown", "") or ""
+    pairs = [(href, text.strip()) for text, href in _MD_LINK.findall(markdown)]
+    linked = {href for href, _ in pairs}
+    pairs += [(url, "") for url in _BARE.findall(markdown) if url not in linked]
+    return pairs
+
+
+def score_link(url: str, anchor: str, page_site: str) -> float:
+    anchor = anchor.lower()
+    path   = urlparse(url).path.lower()
+
+    score = sum(w for k, w in ANCHOR_KEYWORDS.items() if k in anchor)
+    score += sum(w for k, w in PATH_KEYWORDS.items() if k in path)
+    if any(k in anchor or k.replace(" ", "-") in path for k in NOISE_KEYWORDS):
+        score -= 4
+    if _site(urlparse(url).netloc) == page_site:
+        score += SAME_SITE_BONUS
+    return score
+
+
+def extract_outlinks(result, page_url: str) -> list[tuple[float, str, str]]:
+    """
+    Resolve, de-duplicate and score every link on a crawled page.
+    Returns (score, url, anchor text) best first, dropping only noise links
+    scoring below MIN_LINK_SCORE; callers apply their own allow-lists,
+    domain weighting and top-K.
+    """
+    page      = normalize_url(page_url)
+    page_site = _site(urlparse(page_url).netloc)
+    best = {}
+    for href, anchor in _raw_links(result):
+        href = (href or "").strip()
+        if not href or href.startswith(("#", "mailto:", "tel:", "javascript:")):
+            continue
+        url = urljoin(page_url, href)
+        if urlparse(url).scheme not in ("http", "https"):
+            continue
+        url = normalize_url(url)
+        if url == page:
+            continue
+        score = score_link(url, anchor, page_site)
+        if url not in best or score > best[url][0]:
+            best[url] = (score, url, anchor)
+
+    ranked = sorted((b for b in best.values() if b[0] >= MIN_LINK_SCORE), key=lambda b: b[0], reverse=True)
+    return ranked
@@ -0,0 +1,278 @@
+import re
+from collections import defaultdict
+from datetime import datetime
+from difflib import SequenceMatcher
+from urllib.parse import urlparse
+
+from scraper.utils.features import build_features
+
+# Words that say what kind of program it is, not which one — never used as blocking keys
+GENERIC_WORDS = {
+    "program", "programme", "fellowship", "fellowships", "internship", "internships",
+    "research", "summer", "winter", "mentorship", "scholarship", "scholarships",
+    "student", "students", "undergraduate", "apply", "application", "official",
+    "india", "indian", "university", "institute", "technology", "science", "page",
+}
+# Words that can differ between two names of the same program: sub-page titles
+# ("GSoC FAQ", "SRIP Timeline") and program/page boilerplate. Anything else a
+# name has that the other lacks ("India", "PhD", "Prep", "Internship") means
+# a different program.
+IGNORABLE_WORDS = {
+    "program", "programme", "programs", "programmes", "official", "apply", "application",
+    "applications", "page", "home", "faq", "faqs", "timeline", "eligibility", "deadline",
+    "deadlines", "dates", "important", "how", "overview", "details", "guidelines", "guide",
+    "student", "students",
+}
+NAME_STOPWORDS = {"the", "of", "for", "and", "in", "at", "to", "a", "an", "-", "&"}
+ORG_SUFFIXES   = {"inc", "ltd", "llc", "pvt", "foundation", "the", "org", "limited"}
+
+# Values the extractor emits when it found nothing; never overwrite real data with these
+PLACEHOLDERS = {"", "check website", "not specified", "unknown", "unknown opportunity", "null", "none"}
+
+# The canonical record keeps its first name; sub-pages tend to produce names like "GSoC FAQ"
+# features is derived from these, so it is rebuilt after a merge rather than copied
+MERGE_FIELDS = ["organization", "deadline", "stipend", "eligibility", "mode", "is_open"]
+
+TOKEN_MATCH  = 0.85   # 'programme'/'program', 'fellowships'/'fellowship' count as the same word
+ORG_MATCH    = 0.75   # organizations this similar agree
+ORG_CONFLICT = 0.50   # organizations less similar than this never merge
+
+
+def _tokens(text: str) -> list[str]:
+    text = re.sub(r"\b(19|20)\d{2}(-\d{2,4})?\b", " ", (text or "").lower())
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def name_key(name: str) -> str:
+    return " ".join(t for t in _tokens(name) if t not in NAME_STOPWORDS)
+
+
+def org_key(org: str) -> str:
+    return " ".join(t for t in _tokens(org) if t not in ORG_SUFFIXES)
+
+
+def _long_form(name: str) -> str:
+    # drop parenthetical/dashed acronyms so 'GSoC - Google Summer of Code' uses the long form
+    return max(re.split(r"\s[-–|:]\s|\(|\)", name or ""), key=len)
+
+
+def acronym(name: str) -> str:
+    """'Google Summer of Code' -> 'gsoc'; single-token names are returned as-is."""
+    tokens = _tokens(_long_form(name))
+    if len(tokens) == 1:
+        return tokens[0]
+    return "".join(t[0] for t in tokens)
+
+
+def _host(url: str) -> str:
+    return urlparse(url or "").netloc.lower().removeprefix("www.")
+
+
+def _similarity(a: str, b: str) -> float:
+    if not a or not b:
+        return 0.0
+    ta, tb = set(a.split()), set(b.split())
+    jaccard = len(ta & tb) / len(ta | tb)
+    return max(jaccard, SequenceMatcher(None, a, b).ratio())
+
+
+def _shared_tokens(a: str, b: str, ignore=frozenset()) -> set | None:
+    """
+    Tokens two names agree on, or None if either has a token the other lacks
+    that isn't ignorable. An acronym matches the long form it abbreviates.
+    """
+    ta, tb = set(name_key(a).split()), set(name_key(b).split())
+    shared = ta & tb
+    rest_a, rest_b = ta - shared, tb - shared
+
+    for tokens, name, other, rest_other in ((ta, a, tb, rest_b), (tb, b, ta, rest_a)):
+        short = acronym(name)
+        if len(short) >= 3 and short in other:
+            # 'gsoc' on one side covers 'google summer code' on the other
+            long_tokens = set(name_key(_long_form(name)).split())
+            (rest_a if tokens is ta else rest_b).difference_update(long_tokens)
+            rest_other.discard(short)
+            shared.add(short)
+
+    for x in list(rest_a):
+        y = max(rest_b, key=lambda t: SequenceMatcher(None, x, t).ratio(), default=None)
+        if y and SequenceMatcher(None, x, y).ratio() >= TOKEN_MATCH:
+            rest_a.discard(x)
+            rest_b.discard(y)
+            shared.add(x)
+
+    ignorable = IGNORABLE_WORDS | set(ignore)
+    if not shared - ignorable or (rest_a | rest_b) - ignorable:
+        return None
+    return shared
+
+
+def names_compatible(a: str, b: str, orgs=()) -> bool:
+    """
+    Whether two program names can refer to the same program. Words from
+    either organization (e.g. 'JNCASR') may appear in only one of them.
+
+    >>> names_compatible("Microsoft Research India Fellowship", "Microsoft Research PhD Fellowship")
+    False
+    >>> names_compatible("Microsoft Research India Fellowship", "Microsoft Research Internship")
+    False
+    >>> names_compatible("MLH Fellowship", "MLH Fellowship Prep")
+    False
+    >>> names_compatible("Google Summer of Code", "Google Season of Docs")
+    False
+    >>> names_compatible("GSoC", "Google Season of Docs")
+    False
+    >>> names_compatible("Google Summer of Code 2026", "Google Summer of Code FAQ")
+    True
+    >>> names_compatible("GSoC Timeline", "Google Summer of Code")
+    True
+    >>> names_compatible("LFX Mentorship Program", "LFX Mentorship")
+    True
+    >>> names_compatible("SRIP 2026", "Summer Research Internship Program (SRIP)")
+    True
+    >>> names_compatible("SRFP - JNCASR Summer Research Fellowship", "Summer Research Fellowship Programme", ["jncasr"])
+    True
+    """
+    ignore = {t for org in orgs for t in org_key(org).split()}
+    return _shared_tokens(a, b, ignore) is not None
+
+
+def is_informative(value) -> bool:
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return value.strip().lower() not in PLACEHOLDERS
+    if isinstance(value, (list, dict)):
+        return bool(value)
+    return True
+
+
+class EntityResolver:
+    """
+    In-memory index for matching a freshly extracted record to an existing
+    program. Candidates come from a blocking index (distinctive name tokens,
+    acronyms and hosts) so each lookup compares against a handful of
+    records, not the whole collection.
+    """
+
+    def __init__(self):
+        self.entities = {}
+        self.blocks   = defaultdict(set)
+
+    def _keys(self, doc: dict) -> dict:
+        urls = [doc.get("apply_link")] + list(doc.get("source_urls") or [])
+        return {
+            "name":    name_key(doc.get("name")),
+            "org":     org_key(doc.get("organization")),
+            "acronym": acronym(doc.get("name")),
+            "hosts":   {_host(u) for u in urls if u},
+        }
+
+    @staticmethod
+    def _block_keys(keys: dict) -> set:
+        blocks = {f"t:{t}" for t in keys["name"].split() if len(t) >= 3 and t not in GENERIC_WORDS}
+        if len(keys["acronym"]) >= 3:
+            blocks.add(f"a:{keys['acronym']}")
+            blocks.add(f"t:{keys['acronym']}")
+        blocks.update(f"h:{h}" for h in keys["hosts"])
+        return blocks
+
+    def add(self, entity_id, doc: dict):
+        """Index doc under entity_id; repeated adds widen the entity's name/host variants."""
+        keys = self._keys(doc)
+        entry = self.entities.setdefault(entity_id, {"names": set(), "orgs": set(), "hosts": set()})
+        if keys["name"]:
+            entry["names"].add(doc["name"])
+        if keys["org"]:
+            entry["orgs"].add(keys["org"])
+        entry["hosts"] |= keys["hosts"]
+        for block in self._block_keys(keys):
+            self.blocks[block].add(entity_id)
+
+    def remove(self, entity_id):
+        self.entities.pop(entity_id, None)
+        for members in self.blocks.values():
+            members.discard(entity_id)
+
+    def match(self, doc: dict, exclude=None):
+        """Best matching entity id for doc, or None."""
+        keys = self._keys(doc)
+        if not keys["name"]:
+            return None
+
+        candidates = set()
+        for block in self._block_keys(keys):
+            candidates |= self.blocks.get(block, set())
+        candidates.discard(exclude)
+
+        best, best_score = None, 0.0
+        for entity_id in candidates:
+            entry = self.entities[entity_id]
+            if keys["org"] and entry["orgs"]:
+                org_sim = max(_similarity(keys["org"], o) for o in entry["orgs"])
+                if org_sim < ORG_CONFLICT:
+                    continue
+            else:
+                org_sim = 0.0
+
+            ignore = {t for o in entry["orgs"] | {keys["org"]} for t in o.split()}
+            name_sim, distinctive = 0.0, False
+            for name in entry["names"]:
+                shared = _shared_tokens(doc["name"], name, ignore)
+                if shared is None:
+                    continue
+                name_sim = max(name_sim, _similarity(keys["name"], name_key(name)))
+                distinctive = distinctive or bool(shared - GENERIC_WORDS - IGNORABLE_WORDS)
+            if not name_sim:
+                continue
+
+            # names made only of generic words ('Research Internship') need the org or host to agree
+            same_host = bool(keys["hosts"] & entry["hosts"])
+            if distinctive or org_sim >= ORG_MATCH or same_host:
+                score = name_sim + org_sim + (0.5 if same_host else 0)
+                if score > best_score:
+                    best, best_score = entity_id, score
+        return best
+
+
+def freshest_fields(doc: dict) -> dict:
+    """Fields from a newly extracted doc that are worth writing over a canonical record."""
+    return {f: doc[f] for f in MERGE_FIELDS if f in doc and is_informative(doc[f])}
+
+
+def merge_documents(docs: list[dict]) -> dict:
+    """
+    Collapse duplicate records into one canonical document. The
+    highest-trust (then oldest) record keeps its _id, name and apply_link;
+    the other fields take the most recently updated informative value.
+    """
+    oldest_first = sorted(docs, key=lambda d: str(d["_id"]))
+    base = max(oldest_first, key=lambda d: d.get("trust_score") or 0)
+    newest_first = sorted(docs, key=lambda d: d.get("last_updated") or datetime.min, reverse=True)
+
+    merged = dict(base)
+    for field in MERGE_FIELDS:
+        for doc in newest_first:
+            if is_informative(doc.get(field)):
+                merged[field] = doc[field]
+                break
+
+    sources, tags = [], []
+    for doc in docs:
+        for url in [doc.get("apply_link")] + list(doc.get("source_urls") or []):
+            if url and url not in sources:
+                sources.append(url)
+        for tag in doc.get("tags") or []:
+            if tag not in tags:
+                tags.append(tag)
+    merged["source_urls"]  = sources
+    merged["tags"]         = tags
+    merged["trust_score"]  = max((d.get("trust_score") or 0) for d in docs)
+    merged["last_updated"] = newest_first[0].get("last_updated")
+
+    # degree/location lists only exist inside features; take the newest non-empty ones
+    def newest(key):
+        return next((d["features"][key] for d in newest_first
+                     if isinstance(d.get("features"), dict) and d["features"].get(key)), None)
+    merged["features"] = build_features({**merged, "degree_levels": newest("degrees"), "locations": newest("locations")})
+    return merged